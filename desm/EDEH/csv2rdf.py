@@ -1,16 +1,34 @@
 #!/usr/bin/env python3
 
 import csv
+import sys
 import argparse
 import uuid
 from rdflib import Graph, URIRef, Literal, Namespace
 from rdflib.namespace import RDF, RDFS, OWL, XSD
+# RDFLib's own N-Triples formatting of a triple, including literal escaping
+from rdflib.plugins.serializers.nt import _nt_row
+
+class NTriplesWriter:
+    """
+    Stand-in for Graph that writes triples as N-Triples as soon as they are added
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def add(self, triple):
+        self.stream.write(_nt_row(triple))
+
+    def addN(self, quads):
+        self.stream.writelines(_nt_row((s, p, o)) for s, p, o, _ in quads)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Convert CSV file to RDF ontology')
     parser.add_argument('CSV', help='data schema as CSV file')
     parser.add_argument('-o', '--output', help='Output file name')
     parser.add_argument('-b', '--base', help='Base URI')
+    parser.add_argument('--validate', action='store_true', help='build the graph with RDFLib and serialize as Turtle')
     args = parser.parse_args()
 
     if not args.base:
@@ -18,22 +36,45 @@ if __name__ == '__main__':
 
     SCHEMA = Namespace('https://schema.org/')
 
-    g = Graph()
+    if args.validate:
+        g = Graph()
+    else:
+        # N-Triples is valid Turtle, so the output can be written as we go
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        g = NTriplesWriter(out)
     g.add((URIRef(args.base), RDF.type, OWL.Ontology))
 
     with open(args.CSV) as csvfile:
-        reader = csv.DictReader(csvfile)
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        column = {name: i for i, name in enumerate(header)}
+        slug_i = column["Property slug"]
+        title_i = column["Property title"]
+        definition_i = column["Property definition"]
+        class_i = column["Class"]
 
-        for line in reader:
-            uri = URIRef(f'{args.base}{line["Property slug"]}')
-            g.add((uri, RDF.type, RDF.Property))
-            g.add((uri, RDF.type, OWL.DatatypeProperty))
-            g.add((uri, RDFS.label, Literal(line["Property title"])))
-            g.add((uri, RDFS.comment, Literal(line["Property definition"])))
-            g.add((uri, SCHEMA.domainIncludes, URIRef(f'{args.base}{line["Class"]}')))
+        # for a Graph, collect all triples first and add them in one go
+        quads = []
+        add = quads.append
+        for row in reader:
+            if not row:
+                continue # blank line
+            uri = URIRef(args.base + row[slug_i])
+            add((uri, RDF.type, RDF.Property, g))
+            add((uri, RDF.type, OWL.DatatypeProperty, g))
+            add((uri, RDFS.label, Literal(row[title_i]), g))
+            add((uri, RDFS.comment, Literal(row[definition_i]), g))
+            add((uri, SCHEMA.domainIncludes, URIRef(args.base + row[class_i]), g))
+            if not args.validate:
+                # write out each row as soon as it is read
+                g.addN(quads)
+                quads.clear()
+        g.addN(quads)
 
-    if args.output:
+    if not args.validate:
+        if args.output:
+            out.close()
+    elif args.output:
         g.serialize(destination=args.output)
     else:
         print(g.serialize(format='turtle'))
-
@@ -2,14 +2,47 @@ import argparse
 import pathlib
 import os
 import logging
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-from rdflib import Graph, Literal, RDF, URIRef, Namespace
+from rdflib import Graph, Literal, RDF, URIRef, Namespace, plugin
 from rdflib.namespace import RDF, RDFS, SH, OWL
+from rdflib.parser import Parser
+from rdflib.util import guess_format
+
+# optional: Oxigraph-backed store and parsers, much faster than RDFLib's own
+try:
+    import oxrdflib
+except ImportError:
+    oxrdflib = None
 
 ELM = Namespace("http://data.europa.eu/snb/model/elm/")
 LOQ = Namespace("http://data.europa.eu/snb/model/ap/loq-constraints/")
 SCHEMA = Namespace("https://schema.org/")
 
+# characters not allowed in output file names
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w+-]')
+
+def _oxigraph_format(ontology_file):
+    """
+    name of the oxrdflib parser for the given file, or None if oxrdflib is unavailable or cannot parse it
+    """
+    if oxrdflib is None:
+        return None
+    ox_format = f'ox-{guess_format(str(ontology_file))}'
+    try:
+        plugin.get(ox_format, Parser)
+    except plugin.PluginException:
+        return None
+    return ox_format
+
+def _load_monolingual_nt(ontology_file, desired_language):
+    """
+    worker for parallel loading: returns the monolingual graph as N-Triples,
+    which is cheaper to pass back to the main process than a pickled Graph
+    """
+    return ShaclToDesm.load_monolingual(ontology_file, desired_language).serialize(format='nt')
+
 class ShaclToDesm:
     """
     convert SHACL shapes and info from related ontology into a form suitable for DESM
@@ -20,10 +53,23 @@ class ShaclToDesm:
         initialise class by loading input files
         """
         self.logger = logging.getLogger(__name__)
+        self._value_cache = {}
+        self._class_cache = {}
         # load input graphs
         self.graph = self._new_graph()
-        for file in input_files:
-            self.load_monolingual(file, language)
+        cpus = os.cpu_count() or 1
+        if len(input_files) == 1 or cpus == 1:
+            # nothing to parallelise, and merging N-Triples would only add work
+            for file in input_files:
+                self.graph += self.load_monolingual(file, language)
+        else:
+            # parse files in parallel, merge them as they are done; the merge runs in the
+            # main process one file at a time, so use Oxigraph's much faster parser for it
+            nt_format = 'ox-ntriples' if oxrdflib else 'nt'
+            with ProcessPoolExecutor(max_workers=min(len(input_files), cpus)) as executor:
+                futures = [executor.submit(_load_monolingual_nt, file, language) for file in input_files]
+                for future in as_completed(futures):
+                    self.graph.parse(data=future.result(), format=nt_format)
         self.logger.info(f"Loaded {len(self.graph)} triples")
 
 
@@ -31,33 +77,51 @@ class ShaclToDesm:
         """
         create an empty Graph with some defaults
         """
-        graph = Graph(bind_namespaces="rdflib")
+        # Oxigraph has full composite indexes, RDFLib's Memory store does not
+        graph = Graph(store='Oxigraph' if oxrdflib else 'default', bind_namespaces="rdflib")
         graph.bind('elm', ELM)
         graph.bind('loq', LOQ)
         graph.bind('schema', SCHEMA)
         return graph
 
 
-    def load_monolingual(self, ontology_file, desired_language):
+    @staticmethod
+    def load_monolingual(ontology_file, desired_language):
         """
         Extracts a monolingual version of the given RDF ontology.
         
         Args:
             ontology_file (str): Path to the multi-lingual RDF ontology file.
-            graph (Graph): Graph to which to add the loaded triples
             desired_language (str): The language code of the desired language (e.g., "en", "fr", "es").
+
+        Returns:
+            Graph: the triples of the ontology, without literals in other languages
         """
         # Load the multi-lingual RDF ontology
-        ontology_graph = Graph()
-        ontology_graph.parse(ontology_file)
+        if ox_format := _oxigraph_format(ontology_file):
+            ontology_graph = Graph(store='Oxigraph')
+            ontology_graph.parse(ontology_file, format=ox_format)
+        else:
+            ontology_graph = Graph()
+            ontology_graph.parse(ontology_file)
         
-        # Iterate through the triples and filter by language
-        for subject, predicate, object in ontology_graph:
-            if isinstance(object, Literal):
-                if object.language == desired_language:
-                    self.graph.add((subject, predicate, object))
-            else:
-                self.graph.add((subject, predicate, object))
+        # Filter by language and add all remaining triples in one go
+        graph = Graph()
+        graph.addN(
+            (subject, predicate, object, graph)
+            for subject, predicate, object in ontology_graph
+            if not isinstance(object, Literal) or object.language == desired_language
+        )
+        return graph
+
+
+    def _values(self, predicate):
+        """
+        map subjects to (any) object for the given predicate, built once per predicate
+        """
+        if predicate not in self._value_cache:
+            self._value_cache[predicate] = dict(self.graph.subject_objects(predicate))
+        return self._value_cache[predicate]
 
 
     def shape_to_desm(self, shape):
@@ -73,20 +137,29 @@ class ShaclToDesm:
             self.logger.warning(f" - shape has no targetClass, skipping.")
             return None
         self.logger.info(f" - targetClass: {targetClass}")
-        for predicate, object in self.graph.predicate_objects(targetClass):
+        if targetClass not in self._class_cache:
+            self._class_cache[targetClass] = list(self.graph.predicate_objects(targetClass))
+        for predicate, object in self._class_cache[targetClass]:
             desm_graph.add((targetClass, predicate, object))
+        paths = self._values(SH.path)
+        names = self._values(SH.name)
+        descriptions = self._values(SH.description)
+        labels = self._values(RDFS.label)
+        comments = self._values(RDFS.comment)
+        datatypes = self._values(SH.datatype)
+        classes = self._values(SH['class'])
         # iterate over all properties, include each with appropriate rdfs:domain
         for property in self.graph.objects(shape, SH.property):
-            path = self.graph.value(property, SH.path)
+            path = paths.get(property)
             desm_graph.add((path, RDF.type, RDF.Property))
             desm_graph.add((path, RDF.type, OWL.ObjectProperty))
             desm_graph.add((path, RDFS.domain, targetClass))
             desm_graph.add((path, SCHEMA.domainIncludes, targetClass))
-            label = self.graph.value(property, SH.name, any=True) or self.graph.value(path, RDFS.label, any=True)
-            comment = self.graph.value(property, SH.description, any=True) or self.graph.value(path, RDFS.comment, any=True)
+            label = names.get(property) or labels.get(path)
+            comment = descriptions.get(property) or comments.get(path)
             desm_graph.add((path, RDFS.label, label))
             desm_graph.add((path, RDFS.comment, comment))
-            if range := self.graph.value(property, SH.datatype) or self.graph.value(property, SH['class']):
+            if range := datatypes.get(property) or classes.get(property):
                 desm_graph.add((path, RDFS.range, range))
                 desm_graph.add((path, SCHEMA.rangeIncludes, range))
         return desm_graph
@@ -106,27 +179,40 @@ if __name__ == '__main__':
     parser.add_argument("-m", "--merge",
                         help="merge output into one graph",
                         action="store_true")
+    parser.add_argument("-n", "--ntriples",
+                        help="write N-Triples instead of Turtle (much faster for large graphs)",
+                        action="store_true")
     parser.add_argument("-v", "--verbose",
                         help="increase output verbosity",
                         action="store_true")
     args = parser.parse_args()
 
     converter = ShaclToDesm(args.INPUT)
+    suffix, rdf_format = ('.nt', 'nt') if args.ntriples else ('.ttl', 'turtle')
 
     if args.merge:
         target_graph = converter._new_graph()
 
+    def convert_shape(shape, filename):
+        """
+        convert one shape and, unless merging, write it to its own file
+        """
+        if (desm_graph := converter.shape_to_desm(shape)) and not args.merge:
+            desm_graph.serialize(destination=filename, format=rdf_format, encoding="utf-8")
+            logger.info(f' - written to {filename}')
+        return desm_graph
+
     logger.info("Graph contains SHACL shapes for:")
-    for shape in converter.graph.subjects(RDF.type, SH.NodeShape):
-        filename = os.path.join(args.output, "".join((c if c.isalnum() or c in '-_+' else '_') for c in shape.n3(converter.graph.namespace_manager)) + ".ttl")
-        if desm_graph := converter.shape_to_desm(shape):
-            if args.merge:
+    shapes = list(converter.graph.subjects(RDF.type, SH.NodeShape))
+    filenames = [os.path.join(args.output, UNSAFE_FILENAME_CHARS.sub('_', shape.n3(converter.graph.namespace_manager)) + suffix)
+                 for shape in shapes]
+    # shapes are converted independently, each into a graph of its own; merging is done here, one at a time
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for desm_graph in executor.map(convert_shape, shapes, filenames):
+            if args.merge and desm_graph:
                 target_graph += desm_graph
-            else:
-                desm_graph.serialize(destination=filename)
-                logger.info(f' - written to {filename}')
     if args.merge:
-        filename = os.path.join(args.output, "ELM-for-DESM.ttl")
-        target_graph.serialize(destination=filename)
+        filename = os.path.join(args.output, "ELM-for-DESM" + suffix)
+        target_graph.serialize(destination=filename, format=rdf_format, encoding="utf-8")
         logger.info(f' - written to {filename}')
 
@@ -8,58 +8,102 @@
 
 import argparse
 import json
+import sys
 import uuid
+from functools import lru_cache
 
 import yaml
 import jsonref
 
+# use the libyaml-based loader if PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from rdflib import Graph, Namespace, URIRef, Literal
 from rdflib.namespace import RDF, RDFS, SKOS, OWL, XSD
+from rdflib.plugins.serializers.nt import _nt_row
 from pathlib import Path
 
 # Define namespaces
 OAS = Namespace("https://spec.openapis.org/oas#")
 SCHEMA = Namespace('https://schema.org/')
 
+class NTriplesWriter:
+    """
+    Stand-in for Graph that writes triples as N-Triples as soon as they are added
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def add(self, triple):
+        self.stream.write(_nt_row(triple))
+
+    def addN(self, quads):
+        self.stream.writelines(_nt_row((s, p, o)) for s, p, o, _ in quads)
+
+# RDFS.range for simple schema types
+TYPE_RANGES = {
+    'string': XSD.string,
+    'integer': XSD.integer,
+    'number': XSD.decimal,
+    'boolean': XSD.boolean,
+    'object': RDFS.Class,
+}
+
 def type2rdf(prop_details):
     """
     Convert schema types to value for RDFS.range
     """
     if 'type' in prop_details:
-        if 'string' in prop_details['type']:
-            return XSD.string
-        elif 'integer' in prop_details['type']:
-            return XSD.integer
-        elif 'object' in prop_details['type']:
-            return RDFS.Class
-        elif 'array' in prop_details['type']:
-            if 'items' in prop_details:
-                return type2rdf(prop_details['items'])
-            else:
-                return RDFS.Literal
-        else:
-            return RDFS.Literal
+        types = prop_details['type']
+        # type can be a single name or a list of names, such as ['string', 'null']
+        for type_name in ([types] if isinstance(types, str) else types):
+            if range := TYPE_RANGES.get(type_name):
+                return range
+            elif type_name == 'array':
+                if 'items' in prop_details:
+                    return type2rdf(prop_details['items'])
+                else:
+                    return RDFS.Literal
+        return RDFS.Literal
     elif 'oneOf' in prop_details:
         return type2rdf(prop_details['oneOf'][0])
     else:
         return RDFS.Literal
 
+# property names, descriptions and the like recur across schemas, so their terms are created once
+@lru_cache(maxsize=None)
+def cached_literal(value):
+    return Literal(value)
+
+@lru_cache(maxsize=None)
+def cached_uri(name):
+    return EX[name]
+
 def schema2rdf(schema_name, schema_details, g):
     """
     Convert OpenAPI-style JSON schema to RDF
+
+    g can be a Graph or an NTriplesWriter
     """
+    # collect all triples first and add them in one go
+    quads = []
+    add = quads.append
 
     # represent schema as class
-    schema_uri = EX[schema_name]
-    g.add((schema_uri, RDF.type, RDFS.Class))
-    g.add((schema_uri, RDFS.label, Literal(schema_name)))
+    schema_uri = cached_uri(schema_name)
+    add((schema_uri, RDF.type, RDFS.Class, g))
+    add((schema_uri, RDFS.label, cached_literal(schema_name), g))
 
     if 'description' in schema_details:
-        g.add((schema_uri, RDFS.comment, Literal(schema_details['description'])))
+        add((schema_uri, RDFS.comment, cached_literal(schema_details['description']), g))
     elif 'allOf' in schema_details:
         for sub in reversed(schema_details['allOf']):
             if 'description' in sub:
-                g.add((schema_uri, RDFS.comment, Literal(sub['description'])))
+                add((schema_uri, RDFS.comment, cached_literal(sub['description']), g))
                 break
 
     if 'properties' in schema_details:
@@ -73,19 +117,20 @@ def schema2rdf(schema_name, schema_details, g):
 
     # Convert properties inside schema
     for prop_name, prop_details in properties.items():
-        prop_uri = EX[prop_name]
-        g.add((prop_uri, RDF.type, RDF.Property))
-        g.add((prop_uri, RDFS.label, Literal(prop_name)))
-        g.add((prop_uri, SCHEMA.domainIncludes, schema_uri))
+        prop_uri = cached_uri(prop_name)
+        add((prop_uri, RDF.type, RDF.Property, g))
+        add((prop_uri, RDFS.label, cached_literal(prop_name), g))
+        add((prop_uri, SCHEMA.domainIncludes, schema_uri, g))
         if 'description' in prop_details:
-            g.add((prop_uri, RDFS.comment, Literal(prop_details['description'])))
+            add((prop_uri, RDFS.comment, cached_literal(prop_details['description']), g))
         elif 'oneOf' in prop_details:
             for sub in prop_details['oneOf']:
                 if 'description' in sub:
-                    g.add((prop_uri, RDFS.comment, Literal(sub['description'])))
+                    add((prop_uri, RDFS.comment, cached_literal(sub['description']), g))
                     break
-        g.add((prop_uri, RDFS.range, type2rdf(prop_details)))
+        add((prop_uri, RDFS.range, type2rdf(prop_details), g))
 
+    g.addN(quads)
 
 
 if __name__ == '__main__':
@@ -95,6 +140,7 @@ if __name__ == '__main__':
     parser.add_argument('-b', '--base', help='Base URI for generated RDF')
     parser.add_argument('-p', '--prefix', help='Prefix mapped to base URI (default: "api")', default="api")
     parser.add_argument('-o', '--output', help='RDF output file name')
+    parser.add_argument('--validate', action='store_true', help='build the graph with RDFLib and serialize as Turtle')
     args = parser.parse_args()
 
     if not args.base:
@@ -104,18 +150,23 @@ if __name__ == '__main__':
 
     print(f"Loading OpenAPI spec from {args.SPEC}...")
     with open(args.SPEC, 'r') as f:
-        spec = yaml.safe_load(f)
+        spec = yaml.load(f, Loader=SafeLoader)
         #openapi_data = yaml.safe_load(f)
 
-    # Resolve all $ref references
-    openapi_data = jsonref.JsonRef.replace_refs(spec)
+    # Resolve all $ref references up front, into plain dicts rather than lazy proxies
+    openapi_data = jsonref.replace_refs(spec, proxies=False, lazy_load=False)
 
-    # Create RDF graph
-    g = Graph()
-    g.bind(args.prefix, EX)
-    g.bind("oas", OAS)
-    g.bind("skos", SKOS)
-    g.bind("schema", SCHEMA)
+    if args.validate:
+        # Create RDF graph
+        g = Graph()
+        g.bind(args.prefix, EX)
+        g.bind("oas", OAS)
+        g.bind("skos", SKOS)
+        g.bind("schema", SCHEMA)
+    else:
+        # N-Triples is valid Turtle, so the output can be written as we go
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        g = NTriplesWriter(out)
 
     # Convert OpenAPI info to RDF
     api_uri = EX.api
@@ -131,8 +182,12 @@ if __name__ == '__main__':
         schema_details = openapi_data['components']['schemas'][schema_name]
         schema2rdf(schema_name, schema_details, g)
 
+    if not args.validate:
+        if args.output:
+            out.close()
+            print(f"✅ OpenAPI converted to RDF: {args.output}")
     # Save as Turtle
-    if args.output:
+    elif args.output:
         g.serialize(destination=args.output)
         print(f"✅ OpenAPI converted to RDF: {args.output}")
     else:
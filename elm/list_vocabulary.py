@@ -13,21 +13,27 @@ ELM = Namespace("http://data.europa.eu/snb/model/elm/")
 LOQ = Namespace("http://data.europa.eu/snb/model/ap/loq-constraints/")
 SCHEMA = Namespace("https://schema.org/")
 
-def get_property_lang(graph, subject, predicate, language):
+def build_language_index(graph):
+    """
+    index all language-tagged literals by (subject, predicate, language)
+    """
+    lang_index = {}
+    for subject, predicate, object in graph:
+        if isinstance(object, Literal) and object.language:
+            lang_index.setdefault((subject, predicate, object.language), object)
+    return lang_index
+
+def get_property_lang(lang_index, subject, predicate, language):
     """
     get a property in a specific language
     """
-    for label in graph.objects(subject, predicate):
-        if isinstance(label, Literal):
-            if label.language == language:
-                return label
-    return f'[no label: {subject}]'
+    return lang_index.get((subject, predicate, language), f'[no label: {subject}]')
 
-def get_label(graph, subject, language):
+def get_label(lang_index, subject, language):
     """
     get label in specific language
     """
-    return get_property_lang(graph, subject, SKOS.prefLabel, language)
+    return get_property_lang(lang_index, subject, SKOS.prefLabel, language)
 
 if __name__ == '__main__':
     logger = logging.getLogger(__name__)
@@ -51,19 +57,20 @@ if __name__ == '__main__':
 
     # Load the file
     graph.parse(args.INPUT)
+    lang_index = build_language_index(graph)
 
     console = Console()
 
     for scheme in graph.subjects(RDF.type, SKOS.ConceptScheme):
-        table = Table(title=f"{get_label(graph, scheme, args.language)} ({scheme})")
+        table = Table(title=f"{get_label(lang_index, scheme, args.language)} ({scheme})")
         table.add_column("URI", style="cyan", no_wrap=True)
         table.add_column("Label", style="magenta")
         table.add_column("Definition")
 
         for concept in graph.subjects(SKOS.inScheme, scheme):
-            table.add_row(concept, get_label(graph, concept, args.language), get_property_lang(graph, concept, SKOS.definition, args.language))
-            if not graph.triples((concept, RDF.type, SKOS.Concept)):
-                logger.warn("! {concept} is not of type skos:Concept")
+            table.add_row(concept, get_label(lang_index, concept, args.language), get_property_lang(lang_index, concept, SKOS.definition, args.language))
+            if (concept, RDF.type, SKOS.Concept) not in graph:
+                logger.warning(f"! {concept} is not of type skos:Concept")
 
         console.print(table)
 
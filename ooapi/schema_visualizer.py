@@ -10,16 +10,33 @@ Drafted by Claude and ajusted by Colin Tück
 import yaml
 import json
 import csv
-import pandas as pd
+import operator
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple, Set
+from typing import Dict, List, Any, Optional, Tuple, FrozenSet, Callable, NamedTuple
 import urllib.parse
 import argparse
-from dataclasses import dataclass
+from functools import reduce
 
+# use the libyaml-based loader if PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
-@dataclass
-class SchemaProperty:
+# orjson is faster for JSON schemas, but optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+COLUMNS = ['Path', 'Property Name', 'Expected Data Type', 'Cardinality', 'Description']
+
+# shown as escape sequences in the preview, like pandas does, so that each row stays on one line
+PREVIEW_ESCAPES = str.maketrans({'\n': '\\n', '\r': '\\r', '\t': '\\t'})
+
+
+class SchemaProperty(NamedTuple):
     """Represents a property in the JSON Schema"""
     path: str
     name: str
@@ -31,7 +48,8 @@ class SchemaProperty:
 class JSONSchemaVisualizer:
     def __init__(self, base_path: Optional[Path] = None):
         self.base_path = base_path or Path.cwd()
-        self.resolved_refs: Set[str] = set()
+        self.ref_cache: Dict[Tuple[str, str], Tuple[Dict[str, Any], Path]] = {}
+        self.accessor_cache: Dict[str, Callable[[Any], Any]] = {}
         self.schema_cache: Dict[str, Dict] = {}
         self.properties: List[SchemaProperty] = []
 
@@ -47,10 +65,14 @@ class JSONSchemaVisualizer:
             return self.schema_cache[cache_key]
 
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                if path.suffix.lower() in ['.yaml', '.yml']:
-                    schema = yaml.safe_load(f)
-                else:
+            if path.suffix.lower() in ['.yaml', '.yml']:
+                with open(path, 'r', encoding='utf-8') as f:
+                    schema = yaml.load(f, Loader=SafeLoader)
+            elif orjson:
+                with open(path, 'rb') as f:
+                    schema = orjson.loads(f.read())
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
                     schema = json.load(f)
 
             self.schema_cache[cache_key] = schema
@@ -63,50 +85,47 @@ class JSONSchemaVisualizer:
             print(f"Warning: Error loading {path}: {e}")
             return {}
 
-    def resolve_reference(self, ref: str, current_schema: Dict[str, Any], current_path: Path) -> Dict[str, Any]:
-        """Resolve $ref references"""
-        if ref in self.resolved_refs:
-            return {"type": "object", "description": f"Circular reference to {ref}"}
+    def resolve_reference(self, ref: str, current_schema: Dict[str, Any], current_path: Path) -> Tuple[Dict[str, Any], Path]:
+        """Resolve $ref references to the target schema and the file it is in, caching the result per file and reference"""
+        cache_key = (str(current_path), ref)
+        if cache_key not in self.ref_cache:
+            self.ref_cache[cache_key] = self._resolve_reference(ref, current_schema, current_path)
+        return self.ref_cache[cache_key]
 
-        self.resolved_refs.add(ref)
-
-        try:
-            if ref.startswith('#/'):
-                # Internal reference
-                parts = ref[2:].split('/')
-                result = current_schema
-                for part in parts:
-                    if isinstance(result, dict) and part in result:
-                        result = result[part]
-                    else:
-                        return {"type": "unknown", "description": f"Unresolved reference: {ref}"}
-                return result
+    def _resolve_reference(self, ref: str, current_schema: Dict[str, Any], current_path: Path) -> Tuple[Dict[str, Any], Path]:
+        """Look up the target of a $ref, and the file that references inside the target are relative to"""
+        if ref.startswith('#/'):
+            # Internal reference, relative to the root of the current file
+            return self._lookup(ref[2:], self.load_schema(str(current_path)), ref), current_path
 
-            elif ref.startswith('http'):
-                # HTTP reference - not implemented for security
-                return {"type": "external", "description": f"External reference: {ref}"}
+        elif ref.startswith('http'):
+            # HTTP reference - not implemented for security
+            return {"type": "external", "description": f"External reference: {ref}"}, current_path
 
+        else:
+            # File reference
+            if '#/' in ref:
+                file_part, fragment = ref.split('#/', 1)
+                file_path = current_path.parent / file_part
+                return self._lookup(fragment, self.load_schema(str(file_path)), ref), file_path
             else:
-                # File reference
-                if '#/' in ref:
-                    file_part, fragment = ref.split('#/', 1)
-                    schema = self.load_schema(str(current_path.parent / file_part))
-                    parts = fragment.split('/')
-                    result = schema
-                    for part in parts:
-                        if isinstance(result, dict) and part in result:
-                            result = result[part]
-                        else:
-                            return {"type": "unknown", "description": f"Unresolved reference: {ref}"}
-                    return result
-                else:
-                    # Whole file reference
-                    return self.load_schema(str(current_path.parent / ref))
-
-        finally:
-            self.resolved_refs.discard(ref)
-
-        return {"type": "unknown", "description": f"Unresolved reference: {ref}"}
+                # Whole file reference
+                file_path = current_path.parent / ref
+                return self.load_schema(str(file_path)), file_path
+
+    def _lookup(self, fragment: str, schema: Dict[str, Any], ref: str) -> Dict[str, Any]:
+        """Follow a JSON pointer fragment, with one accessor built per unique fragment"""
+        accessor = self.accessor_cache.get(fragment)
+        if accessor is None:
+            parts = fragment.split('/')
+            accessor = self.accessor_cache[fragment] = lambda root: reduce(operator.getitem, parts, root)
+        try:
+            result = accessor(schema)
+        except (KeyError, IndexError, TypeError):
+            result = None
+        if not isinstance(result, dict):
+            return {"type": "unknown", "description": f"Unresolved reference: {ref}"}
+        return result
 
     def get_cardinality(self, schema: Dict[str, Any], parent_required: List[str], prop_name: str) -> str:
         """Determine cardinality based on schema constraints"""
@@ -170,74 +189,85 @@ class JSONSchemaVisualizer:
 
     def parse_schema(self, schema: Dict[str, Any], path: str = "", parent_required: List[str] = None, 
                     current_file: Path = None) -> None:
-        """Recursively parse schema and extract properties"""
+        """Parse schema and extract properties, walking nested schemas with an explicit stack"""
         if parent_required is None:
             parent_required = []
 
         if current_file is None:
             current_file = self.base_path
 
-        # Handle $ref
-        if '$ref' in schema:
-            resolved = self.resolve_reference(schema['$ref'], schema, current_file)
-            self.parse_schema(resolved, path, parent_required, current_file)
-            return
+        # Each entry is (property name, schema, path, required, followed refs, file the schema is in).
+        # Entries without a property name are schemas to parse, the others are properties to record.
+        # Children are pushed in reverse so that they come out in document order, depth first.
+        stack: List[Tuple[Optional[str], Dict[str, Any], str, List[str], FrozenSet[Tuple[str, str]], Path]] = [
+            (None, schema, path, parent_required, frozenset(), current_file)
+        ]
+        while stack:
+            prop_name, schema, path, required, refs, current_file = stack.pop()
 
-        # Handle allOf, anyOf, oneOf
-        for combine_key in ['allOf', 'anyOf', 'oneOf']:
-            if combine_key in schema:
-                for i, sub_schema in enumerate(schema[combine_key]):
-                    if combine_key == 'allOf':
-                        sub_path = path
-                    elif combine_key == 'anyOf':
-                        sub_path = f'{path}[or]/'
-                    elif combine_key == 'oneOf':
-                        sub_path = f'{path}[xor]/'
-                    self.parse_schema(sub_schema, sub_path, parent_required, current_file)
-                return
-
-        # Handle object properties
-        if schema.get('type') == 'object' or 'properties' in schema:
-            properties = schema.get('properties', {})
-            required = schema.get('required', [])
-
-            for prop_name, prop_schema in properties.items():
+            if prop_name is not None:
                 prop_path = f"{path}/{prop_name}"
 
                 # Add this property to the list
                 self.properties.append(SchemaProperty(
                     path=path or '/',
                     name=prop_name,
-                    data_type=self.get_type_string(prop_schema),
-                    cardinality=self.get_cardinality(prop_schema, required, prop_name),
-                    description=prop_schema.get('description', '')
+                    data_type=self.get_type_string(schema),
+                    cardinality=self.get_cardinality(schema, required, prop_name),
+                    description=schema.get('description', '')
                 ))
 
-                # Recursively parse nested objects and arrays
-                if prop_schema.get('type') == 'object' or 'properties' in prop_schema:
-                    self.parse_schema(prop_schema, prop_path, [], current_file)
-                elif prop_schema.get('type') == 'array' and 'items' in prop_schema:
-                    items_schema = prop_schema['items']
-                    if items_schema.get('type') == 'object' or 'properties' in items_schema:
-                        self.parse_schema(items_schema, f'{prop_path}[]', [], current_file)
-                    elif '$ref' in items_schema:
-                        resolved = self.resolve_reference(items_schema['$ref'], items_schema, current_file)
-                        self.parse_schema(resolved, f'{prop_path}[]', [], current_file)
-                elif '$ref' in prop_schema:
-                    resolved = self.resolve_reference(prop_schema['$ref'], prop_schema, current_file)
-                    self.parse_schema(resolved, prop_path, [], current_file)
-
-        # Handle array items
-        elif schema.get('type') == 'array' and 'items' in schema:
-            items_schema = schema['items']
-            if items_schema.get('type') == 'object' or 'properties' in items_schema:
-                array_path = f"{path}[]" if path else "[]"
-                self.parse_schema(items_schema, array_path, [], current_file)
-
-    def visualize_schema(self, schema_file: str) -> pd.DataFrame:
+                # Parse nested objects and arrays before the next sibling
+                if schema.get('type') == 'object' or 'properties' in schema:
+                    stack.append((None, schema, prop_path, [], refs, current_file))
+                elif schema.get('type') == 'array' and 'items' in schema:
+                    items_schema = schema['items']
+                    if items_schema.get('type') == 'object' or 'properties' in items_schema or '$ref' in items_schema:
+                        stack.append((None, items_schema, f'{prop_path}[]', [], refs, current_file))
+                elif '$ref' in schema:
+                    stack.append((None, schema, prop_path, [], refs, current_file))
+                continue
+
+            # Handle $ref, skipping targets already being expanded along this path; a target is
+            # identified by its file and fragment, as the same $ref can mean different things in different files
+            if '$ref' in schema:
+                resolved, resolved_file = self.resolve_reference(schema['$ref'], schema, current_file)
+                target = (str(resolved_file), schema['$ref'].partition('#')[2])
+                if target not in refs:
+                    stack.append((None, resolved, path, required, refs | {target}, resolved_file))
+                continue
+
+            # Handle allOf, anyOf, oneOf
+            combine_key = next((key for key in ['allOf', 'anyOf', 'oneOf'] if key in schema), None)
+            if combine_key is not None:
+                if combine_key == 'allOf':
+                    sub_path = path
+                elif combine_key == 'anyOf':
+                    sub_path = f'{path}[or]/'
+                elif combine_key == 'oneOf':
+                    sub_path = f'{path}[xor]/'
+                stack.extend((None, sub_schema, sub_path, required, refs, current_file)
+                             for sub_schema in reversed(schema[combine_key]))
+                continue
+
+            # Handle object properties
+            if schema.get('type') == 'object' or 'properties' in schema:
+                properties = schema.get('properties', {})
+                object_required = schema.get('required', [])
+                stack.extend((name, prop_schema, path, object_required, refs, current_file)
+                             for name, prop_schema in reversed(properties.items()))
+
+            # Handle array items
+            elif schema.get('type') == 'array' and 'items' in schema:
+                items_schema = schema['items']
+                if items_schema.get('type') == 'object' or 'properties' in items_schema:
+                    array_path = f"{path}[]" if path else "[]"
+                    stack.append((None, items_schema, array_path, [], refs, current_file))
+
+    def visualize_schema(self, schema_file: str) -> List[SchemaProperty]:
         """Main method to visualize schema as a table"""
         self.properties = []
-        self.resolved_refs = set()
+        self.ref_cache = {}
         self.schema_cache = {}
 
         schema = self.load_schema(schema_file)
@@ -245,27 +275,21 @@ class JSONSchemaVisualizer:
 
         self.parse_schema(schema, current_file=schema_path)
 
-        # Convert to DataFrame
-        data = []
-        for prop in self.properties:
-            data.append({
-                'Path': prop.path,
-                'Property Name': prop.name,
-                'Expected Data Type': prop.data_type,
-                'Cardinality': prop.cardinality,
-                'Description': prop.description
-            })
-
-        df = pd.DataFrame(data)
-        return df
-
-    def save_as_csv(self, df: pd.DataFrame, output_file: str) -> None:
-        """Save DataFrame as CSV"""
-        df.to_csv(output_file, index=False, encoding='utf-8')
+        return self.properties
+
+    def save_as_csv(self, properties: List[SchemaProperty], output_file: str) -> None:
+        """Save properties as CSV"""
+        with open(output_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(COLUMNS)
+            writer.writerows(properties)
         print(f"Schema visualization saved as CSV: {output_file}")
 
-    def save_as_ods(self, df: pd.DataFrame, output_file: str) -> None:
-        """Save DataFrame as ODS"""
+    def save_as_ods(self, properties: List[SchemaProperty], output_file: str) -> None:
+        """Save properties as ODS"""
+        # pandas is only needed for ODS output
+        import pandas as pd
+        df = pd.DataFrame(properties, columns=COLUMNS)
         try:
             df.to_excel(output_file, index=False, engine='odf')
             print(f"Schema visualization saved as ODS: {output_file}")
@@ -276,6 +300,12 @@ class JSONSchemaVisualizer:
             df.to_excel(output_file, index=False, engine='odf')
             print(f"Schema visualization saved as ODS: {output_file}")
 
+    def format_preview(self, properties: List[SchemaProperty]) -> str:
+        """Format properties as a plain text table with right-aligned columns"""
+        rows = [COLUMNS] + [[str(value).translate(PREVIEW_ESCAPES) for value in prop] for prop in properties]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+        return '\n'.join(' '.join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+
 
 def main():
     parser = argparse.ArgumentParser(description='Visualize JSON Schema as a table')
@@ -293,9 +323,9 @@ def main():
 
     try:
         # Generate table
-        df = visualizer.visualize_schema(Path(args.schema_file).name)
+        properties = visualizer.visualize_schema(Path(args.schema_file).name)
 
-        if df.empty:
+        if not properties:
             print("No properties found in the schema.")
             return
 
@@ -308,16 +338,16 @@ def main():
 
         # Save file
         if args.format == 'csv':
-            visualizer.save_as_csv(df, output_file)
+            visualizer.save_as_csv(properties, output_file)
         else:
-            visualizer.save_as_ods(df, output_file)
+            visualizer.save_as_ods(properties, output_file)
 
         # Print preview
-        print(f"\nPreview of generated table ({len(df)} properties):")
+        print(f"\nPreview of generated table ({len(properties)} properties):")
         print("=" * 80)
-        print(df.head(10).to_string(index=False))
-        if len(df) > 10:
-            print(f"... and {len(df) - 10} more properties")
+        print(visualizer.format_preview(properties[:10]))
+        if len(properties) > 10:
+            print(f"... and {len(properties) - 10} more properties")
 
     except Exception as e:
         print(f"Error: {e}")
@@ -2,39 +2,63 @@
 
 import json
 import argparse
-from rdflib import Graph
+import shutil
+import subprocess
+from rdflib import Dataset
+from rdflib.plugins.parsers.jsonld import to_rdf
+
+# orjson is considerably faster, but optional
+try:
+    import orjson
+    loads = orjson.loads
+    dumps = orjson.dumps
+except ImportError:
+    loads = json.loads
+    # same output as orjson: compact UTF-8
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
 
 parser = argparse.ArgumentParser(description="Injects JSON-LD context into ECIU Learning Opportunities data.")
 parser.add_argument('SOURCE', help="source file")
 parser.add_argument('-c', '--context', help='JSON-LD @context file', default='eciu-context.json')
 parser.add_argument('-o', '--output', help='Output JSON-LD file', default='eciu-parsed-ld.json')
-parser.add_argument('-t', '--turtle', help='Output Turtle file', default='eciu-parsed.ttl')
+parser.add_argument('-n', '--ntriples', help='Output N-Triples file', default='eciu-parsed.nt')
+parser.add_argument('-t', '--turtle', help='Also output Turtle file (converted with riot, if available)')
 args = parser.parse_args()
 
 with open(args.context) as context_file:
     jsonld_context = json.load(context_file)
 
-with open(args.SOURCE) as data_file:
-    eciu_data = json.load(data_file)
-
-if not isinstance(eciu_data, list):
-    raise Exception("ECIU data should be an array but it's not")
+with open(args.SOURCE, 'rb') as data_file:
+    if data_file.read(1024).lstrip()[:1] == b'[':
+        # array of JSON-encoded strings, one document each
+        data_file.seek(0)
+        graph = [loads(line) for line in loads(data_file.read())]
+    else:
+        # JSON Lines, one document per line
+        data_file.seek(0)
+        graph = [loads(line) for line in data_file if line.strip()]
 
 jsonld = {
     '@context': jsonld_context['@context'],
-    '@graph': []
+    '@graph': graph
 }
 
-i = 0
-for line in eciu_data:
-    jsonld['@graph'].append(json.loads(line))
-    i += 1
-print(f'parsed {i} lines')
+print(f'parsed {len(graph)} lines')
+
+with open(args.output, "wb") as output_file:
+    output_file.write(dumps(jsonld))
 
-with open(args.output, "w") as output_file:
-    json.dump(jsonld, output_file)
+# convert the in-memory JSON-LD directly, rather than serialising and re-parsing it
+g = Dataset()
+to_rdf(jsonld, g, version=1.1)
+# N-Triples can be written in linear time, RDFLib's Turtle serializer is much slower on large graphs
+g.serialize(destination=args.ntriples, format="nt", encoding="utf-8")
 
-g = Graph()
-g.parse(data=json.dumps(jsonld), format="json-ld")
-g.serialize(destination=args.turtle, format="turtle")
+if args.turtle:
+    if shutil.which('riot'):
+        with open(args.turtle, 'wb') as turtle_file:
+            subprocess.run(['riot', '--output=ttl', args.ntriples], stdout=turtle_file, check=True)
+    else:
+        g.serialize(destination=args.turtle, format="turtle")
 
@@ -10,13 +10,22 @@
 # =============================================================================
 
 import argparse
+import base64
 import pathlib
-from rdflib import Graph
 from pyld import jsonld
-import requests
+import httpx
+import aiohttp
+import asyncio
+import concurrent.futures
+import functools
+import gzip
+import hashlib
+import importlib.util
 import json
+import math
 import sys
 import os
+import random
 import json
 import uuid
 import re
@@ -24,7 +33,17 @@ import time
 import meilisearch
 import uuid
 
-print("✅ Dependencies loaded successfully!")
+# orjson is considerably faster at encoding documents, but optional
+try:
+    import orjson
+    def dumps(obj):
+        try:
+            return orjson.dumps(obj)
+        except TypeError: # integers beyond 64 bits
+            return json.dumps(obj, separators=(',', ':')).encode()
+except ImportError:
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
 
 
 # =============================================================================
@@ -32,11 +51,12 @@ print("✅ Dependencies loaded successfully!")
 # =============================================================================
 
 parser = argparse.ArgumentParser(description='n!=??!J!', epilog="this is da epilog")
-parser.add_argument('URI', nargs='?', help='fetch this specific learning opportunity')
-parser.add_argument('-f', '--frame', type=pathlib.Path, help='JSON-LD frame document', required=True)
+parser.add_argument('URI', nargs='*', help='fetch these specific learning opportunities')
+parser.add_argument('-f', '--frame', type=pathlib.Path, help='JSON-LD frame document (default: built-in projection equivalent to frame.json)')
 parser.add_argument('-d', '--dump', action='store_true', help='dump JSON-LD before upload')
 parser.add_argument('-c', '--commit', action='store_true', help='write data to Meilisearch')
-args = parser.parse_args()
+parser.add_argument('--depth', type=int, default=3, help='follow properties up to this many steps from each learning opportunity (default: 3)')
+parser.add_argument('--wait', type=int, default=3600, help='wait this many seconds at most for Meilisearch to finish indexing (default: 3600)')
 
 # Jena Fuseki Configuration
 FUSEKI_URL = os.environ.get('FUSEKI_URL', "https://fuseki.app.quality-link.eu")
@@ -48,74 +68,161 @@ FUSEKI_PASSWORD = os.environ.get('FUSEKI_PASSWORD')
 MEILISEARCH_URL = os.environ.get('MEILISEARCH_URL', "https://lwowo04cs888sswsswoc4kwo.serverfarm.knowledgeinnovation.eu")
 MEILISEARCH_API_KEY = os.environ.get('MEILISEARCH_API_KEY')
 INDEX_NAME = os.environ.get('MEILISEARCH_INDEX', "test-index")
-
-print("⚙️ Configuration variables set")
+UPLOAD_BATCH_SIZE = 1000
+FRAME_WORKERS = os.cpu_count()
+UPLOAD_INTERVAL = 5
+FETCH_TRIES = 4
+LOS_PAGE_SIZE = 1000
 
 # Set up authentication if needed
 auth = None
 if FUSEKI_USERNAME and FUSEKI_PASSWORD:
     auth = (FUSEKI_USERNAME, FUSEKI_PASSWORD)
 
+# same credentials as header, for aiohttp; N-Triples compress very well
+fuseki_headers = {'Accept-Encoding': 'gzip, deflate'}
+if auth:
+    fuseki_headers['Authorization'] = 'Basic ' + base64.b64encode(':'.join(auth).encode()).decode()
+
 # Build query URL
 query_url = f"{FUSEKI_URL}/{DATASET_NAME}/sparql"
 
+# Talk to Meilisearch over HTTP/2 where the server offers it, which multiplexes all
+# requests over a single connection; plain HTTP and HTTP/1.1 servers still work.
+# httpx needs the optional h2 package for HTTP/2, without it stick to HTTP/1.1
+HTTP2 = importlib.util.find_spec('h2') is not None
+MEILISEARCH_LIMITS = httpx.Limits(max_connections=32, keepalive_expiry=60)
+MEILISEARCH_TIMEOUT = httpx.Timeout(60, connect=15)
+# responses meaning Meilisearch is overloaded or timed out, worth retrying
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
 # =============================================================================
 # SECTION 3: GET LIST OF LEARNING OPPORTUNITIES
 # =============================================================================
 
-# Construct SPARQL query to get all LOs
-query_los_list = """
+# Selected LOs are marked with this predicate in the query result, which tells
+# them apart from other LOs that are merely part of a selected LO's graph
+LO_SEED = 'urn:x-quality-link:learningOpportunity'
+
+# characters that need escaping inside SPARQL string literals
+SPARQL_STRING_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+
+def sparql_string(value):
+    """Quote a string as a SPARQL string literal"""
+    return f'"{value.translate(SPARQL_STRING_ESCAPES)}"'
+
+def select_page(last):
+    """Select the next page of LOs after the LO URI last, in a stable order so that pages don't overlap"""
+    after = f"FILTER(STR(?learningOpportunity) > {sparql_string(last)})" if last is not None else ""
+    return f"""{{
+    SELECT DISTINCT ?learningOpportunity
+    WHERE {{
+      VALUES ?type {{ ql:LearningOpportunitySpecification elm:LearningAchievementSpecification elm:Qualification }}
+      ?learningOpportunity rdf:type ?type .
+      {after}
+    }}
+    ORDER BY STR(?learningOpportunity)
+    LIMIT {LOS_PAGE_SIZE}
+  }}"""
+
+def query_los(select_los):
+    """Construct a single SPARQL query that selects the LOs and fetches their graphs"""
+    # property path matching up to MAX_DEPTH steps along any predicate
+    lo_path = '/'.join(['(<>|!<>)?'] * MAX_DEPTH)
+    return f"""
 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
 PREFIX ql: <http://data.quality-link.eu/ontology/v1#>
 PREFIX elm: <http://data.europa.eu/snb/model/elm/>
 
-SELECT ?learningOpportunity
-WHERE {
-  {
-    ?learningOpportunity rdf:type ql:LearningOpportunitySpecification .
-  } UNION {
-    ?learningOpportunity rdf:type elm:LearningAchievementSpecification .
-  } UNION {
-    ?learningOpportunity rdf:type elm:Qualification .
-  }
-}
-LIMIT 100
+CONSTRUCT {{
+  ?learningOpportunity <{LO_SEED}> true .
+  ?s ?p ?o .
+}}
+WHERE {{
+  {select_los}
+  ?learningOpportunity {lo_path} ?s .
+  ?s ?p ?o .
+}}
 """
 
-# Execute LOS query  
-try:
-    los_response = requests.get(query_url, params={'query': query_los_list, 'format': 'application/sparql-results+json'}, auth=auth, timeout=15)
-    los_response.raise_for_status()
-    los_results = los_response.json()['results']['bindings'] if los_response.status_code == 200 else []
-    print(f"✅ LOS query: {len(los_results)} results")
-except Exception as e:
-    print(f"❌ LOS query failed: {e}")
-    raise e
+def index_triple(lo_uris, index, line):
+    """Parse a line of N-Triples into PyLD's RDF dataset form, index it by subject, and pick out the selected LOs"""
+    # parsing line by line also skips PyLD's duplicate check, which is quadratic
+    # in the size of the input; a CONSTRUCT result has no duplicates anyway
+    for triple in jsonld.JsonLdProcessor.parse_nquads(line).get('@default', ()):
+        if triple['predicate']['value'] == LO_SEED:
+            lo_uris.append(triple['subject']['value'])
+        else:
+            index.setdefault(triple['subject']['value'], []).append(triple)
+
+async def fetch_los(session, query):
+    """Fetch the Learning Opportunities and their graphs as N-Triples, and index the triples as they arrive"""
+    lo_uris = []
+    index = {}
+    async with session.get(query_url, params={'query': query, 'format': 'application/n-triples'},
+                           timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=15)) as los_response:
+        los_response.raise_for_status()
+        # split into lines ourselves, literals can be longer than aiohttp's line limit
+        rest = b''
+        async for chunk in los_response.content.iter_any():
+            *lines, rest = (rest + chunk).split(b'\n')
+            for line in lines:
+                index_triple(lo_uris, index, line.decode('utf-8'))
+        index_triple(lo_uris, index, rest.decode('utf-8'))
+    return lo_uris, index
+
+def retryable(e):
+    """Whether a request that failed with e may succeed when repeated: transport errors and overloaded servers"""
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in RETRY_STATUSES
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRY_STATUSES
+    return isinstance(e, (aiohttp.ClientError, httpx.TransportError, asyncio.TimeoutError))
+
+async def with_retry(fetch, *args, tries=FETCH_TRIES):
+    """Await fetch(*args), retrying failed requests with jittered exponential backoff"""
+    for i in range(tries):
+        try:
+            return await fetch(*args)
+        except Exception as e:
+            if i == tries - 1 or not retryable(e):
+                raise
+            delay = 0.2 * 2**i * random.random()
+            print(f"⚠️ Request failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+async def iter_los(session):
+    """Yield the Learning Opportunities page by page, each page with the index of its triples"""
+    if args.URI:
+        # fetch just the given LOs, passed to the endpoint as bindings
+        select_los = f"""VALUES ?learningOpportunity {{ {' '.join(f'<{uri}>' for uri in args.URI)} }}"""
+        yield await with_retry(fetch_los, session, query_los(select_los))
+        return
+
+    # keyset pagination: continue after the last LO of the previous page, unlike
+    # OFFSET this doesn't make the endpoint skip over all earlier pages again
+    last = None
+    while True:
+        lo_uris, index = await with_retry(fetch_los, session, query_los(select_page(last)))
+        if lo_uris:
+            yield lo_uris, index
+        if len(lo_uris) < LOS_PAGE_SIZE:
+            break
+        last = max(lo_uris)
 
 # =============================================================================
 # SECTION 4: DATA TRANSFORMATION FOR MEILISEARCH
 # =============================================================================
 
-# Helper functions for data processing
-def clean_id(uri):
-    """Clean URI to make it Meilisearch-compatible ID"""
-    clean = re.sub(r'[^a-zA-Z0-9\-_]', '_', uri)
-    return re.sub(r'_+', '_', clean).strip('_')
-
-def extract_value(binding, key):
-    """Extract value from SPARQL binding result"""
-    if key in binding:
-        return binding[key]['value']
-    return None
-
-def extract_language_value(binding, key):
-    """Extract value with language info from SPARQL binding"""
-    if key in binding:
-        value = binding[key]['value']
-        lang = binding[key].get('xml:lang', 'en')
-        return {'value': value, 'language': lang}
-    return None
+def doc_id(uri, _ns=uuid.NAMESPACE_URL.bytes):
+    """Same as str(uuid.uuid5(uuid.NAMESPACE_URL, uri)), without building a UUID object"""
+    digest = bytearray(hashlib.sha1(_ns + uri.encode()).digest()[:16])
+    digest[6] = digest[6] & 0x0f | 0x50 # version 5
+    digest[8] = digest[8] & 0x3f | 0x80 # RFC 4122 variant
+    h = digest.hex()
+    return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
 
 # Set up headers for Meilisearch requests
 headers = {
@@ -123,104 +230,532 @@ headers = {
     "Authorization": f"Bearer {MEILISEARCH_API_KEY}"
 }
 
-# Create the index
-create_url = f"{MEILISEARCH_URL}/indexes"
-index_data = {
-    "uid": INDEX_NAME,
-    "primaryKey": "id"
-}
-
-print(f"🏗️ Creating index...")
-
-create_response = requests.post(create_url, headers=headers, json=index_data)
-print(f"📋 Create index response: {create_response.status_code}")
+# remote contexts are the same for every LO, so fetch each of them only once
+remote_document_loader = jsonld.requests_document_loader(timeout=15)
 
-if create_response.status_code not in [200, 201, 202]:
-    print(f"⚠️  Index might already exist or there was an error: {create_response.text}")
+@functools.lru_cache(maxsize=None)
+def load_remote_document(url):
+    return remote_document_loader(url, {})
 
-# Build Learning Opportunity Specification documents  
-print("📚 Processing Learning Opportunity Specifications...")
+def cached_document_loader(url, options={}):
+    return load_remote_document(url)
 
-with open(args.frame) as f:
-    lo_frame =  json.load(f)
+jsonld.set_document_loader(cached_document_loader)
+jsonld_options = {'documentLoader': cached_document_loader, 'processingMode': 'json-ld-1.1'}
 
 # Upload the documents
 upload_url = f"{MEILISEARCH_URL}/indexes/{INDEX_NAME}/documents"
 
-for result in los_results:
-    lo_uri = extract_value(result, 'learningOpportunity')
-    print(f"###\n### {lo_uri}\n###\n")
-
-    query_lo_single = f"""
-        PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-
-        CONSTRUCT {{
-          ?s ?p ?o .
-        }}
-        WHERE {{
-          <{lo_uri}> (<>|!<>)* ?s .
-          ?s ?p ?o .
-        }}
-        """
-    lo_response = requests.get(query_url, params={'query': query_lo_single, 'format': 'application/ld+json'}, auth=auth, timeout=15)
-    lo_response.raise_for_status()
-
-    if args.dump:
-        print("RAW\n---")
-        json.dump(lo_response.json(), sys.stdout, indent=4)
-
-    # use JSON-LD framing
-    framed_json = jsonld.frame(lo_response.json(), lo_frame)
-    if '@context' in framed_json:
-        del framed_json['@context'] # drop context for Meilisearch
-    framed_json['id'] = str(uuid.uuid5(uuid.NAMESPACE_URL, lo_uri)) # use UUIDv5, suitable for Meilisearch
-
-    if args.dump:
-        print("FRAMED\n------")
-        json.dump(framed_json, sys.stdout, indent=4)
-
-    if not args.commit:
-        continue
-
-    upload_response = requests.post(
-        upload_url,
-        headers=headers,
-        json=framed_json
-    )
+def lo_triples(index, lo_uri):
+    """Triples of all nodes at most MAX_DEPTH steps away from the Learning Opportunity, found breadth-first"""
+    triples = []
+    seen = {lo_uri}
+    frontier = [lo_uri]
+    for depth in range(MAX_DEPTH + 1):
+        next_frontier = []
+        for node in frontier:
+            for triple in index.get(node, ()):
+                triples.append(triple)
+                object = triple['object']
+                if object['type'] != 'literal' and object['value'] not in seen:
+                    seen.add(object['value'])
+                    next_frontier.append(object['value'])
+        frontier = next_frontier
+    return triples
+
+# Built-in projection, used when no frame is given: the same result as framing
+# with pipeline/frame.json, written out for that one frame instead of going
+# through PyLD's general framing and compaction
+
+QL = 'http://data.quality-link.eu/ontology/v1#'
+ELM = 'http://data.europa.eu/snb/model/elm/'
+DCTERMS = 'http://purl.org/dc/terms/'
+ADMS = 'http://www.w3.org/ns/adms#'
+SKOS = 'http://www.w3.org/2004/02/skos/core#'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+# prefixes of the frame's context; QL is also its @vocab
+PREFIXES = {'ql': QL, 'elm': ELM, 'dcterms': DCTERMS, 'adms': ADMS, 'skos': SKOS}
+
+# terms of the frame's context with their coercion: a language, a datatype, '@id', '@set' or none
+TERMS = {
+    DCTERMS + 'title': ('dcterms:title', '@language', 'en'),
+    DCTERMS + 'description': ('dcterms:description', '@language', 'en'),
+    DCTERMS + 'modified': ('dcterms:modified', '@type', XSD + 'dateTime'),
+    ELM + 'schemeId': ('elm:schemeId', '@type', '@id'),
+    ELM + 'EQFLevel': ('elm:EQFLevel', '@type', '@id'),
+    ELM + 'ISCEDFCode': ('elm:ISCEDFCode', '@type', '@id'),
+    DCTERMS + 'language': ('dcterms:language', '@type', '@id'),
+    ADMS + 'identifier': ('adms:identifier', '@container', '@set'),
+    QL + 'isActive': ('ql:isActive', '@type', XSD + 'boolean'),
+    **{namespace: (prefix, None, None) for prefix, namespace in PREFIXES.items()},
+}
+TERM_NAMES = {'id', 'type', 'has_instances', *(term for term, _, _ in TERMS.values())}
+
+INTEGER_LEXICAL = re.compile(r'^[+-]?\d+$')
+
+LO_TYPES = {QL + 'LearningOpportunitySpecification', ELM + 'Qualification', ELM + 'LearningAchievementSpecification'}
+
+# the frame itself: each (sub-)frame has its @embed and @explicit flags and the
+# frames of its properties; a frame with 'any' matches every node, otherwise a
+# node must have one of the frame's properties (if it lists any)
+WILDCARD_FRAME = {'embed': '@once', 'explicit': False, 'properties': {}}
+LO_FRAME = {
+    'embed': '@once',
+    'explicit': False,
+    'properties': {
+        DCTERMS + 'publisher': {'embed': '@once', 'explicit': True, 'any': True, 'properties': {
+            ELM + 'legalName': WILDCARD_FRAME,
+            DCTERMS + 'title': WILDCARD_FRAME,
+        }},
+        ELM + 'EQFLevel': {'embed': '@never', 'explicit': False, 'properties': {}},
+        ELM + 'ISCEDFCode': {'embed': '@never', 'explicit': False, 'properties': {}},
+        DCTERMS + 'language': {'embed': '@once', 'explicit': True, 'properties': {
+            SKOS + 'prefLabel': WILDCARD_FRAME,
+        }},
+    },
+}
+
+def literal_value(literal):
+    """Convert an RDF literal to an expanded JSON-LD value, using native types like PyLD's from_rdf"""
+    value = literal['value']
+    if 'language' in literal:
+        return {'@value': value, '@language': literal['language'].lower()}
+    datatype = literal.get('datatype') or XSD + 'string'
+    if datatype == XSD + 'boolean' and value in ('true', '1', 'false', '0'):
+        return {'@value': value in ('true', '1')}
+    if datatype == XSD + 'integer' and INTEGER_LEXICAL.match(value):
+        return {'@value': int(value)}
+    if datatype == XSD + 'double':
+        try:
+            number = float(value)
+            if math.isfinite(number):
+                return {'@value': number}
+        except ValueError:
+            pass
+    if datatype == XSD + 'string':
+        return {'@value': value}
+    return {'@value': value, '@type': datatype}
+
+def node_map(triples):
+    """Collect the types and property values of every node, in expanded JSON-LD form"""
+    nodes = {}
+    for triple in triples:
+        node = nodes.setdefault(triple['subject']['value'], {})
+        predicate = triple['predicate']['value']
+        object = triple['object']
+        if object['type'] == 'literal':
+            value = literal_value(object)
+        else:
+            nodes.setdefault(object['value'], {})
+            if predicate == RDF_TYPE:
+                predicate, value = '@type', object['value']
+            else:
+                value = {'@id': object['value']}
+        values = node.setdefault(predicate, [])
+        if value not in values:
+            values.append(value)
+    return nodes
+
+def frame_matches(node, frame):
+    """Whether a node matches an embedded (sub-)frame"""
+    return frame.get('any') or not frame['properties'] or any(prop in node for prop in frame['properties'])
+
+def frame_node(state, node_id, frame, embedded):
+    """Embed a node following the frame, with the @once/@never and circular reference rules of JSON-LD 1.1 framing"""
+    output = {'@id': node_id}
+    state['bnodes'][node_id] = state['bnodes'].get(node_id, 0) + 1
+    if embedded and (frame['embed'] == '@never' or node_id in state['stack'] or node_id in state['embeds']):
+        return output
+    state['embeds'].add(node_id)
+    state['stack'].append(node_id)
+
+    for prop, values in sorted(state['nodes'][node_id].items()):
+        if prop == '@type':
+            output['@type'] = values
+            continue
+        subframe = frame['properties'].get(prop)
+        if subframe is None:
+            if frame['explicit']:
+                continue
+            subframe = WILDCARD_FRAME
+        for value in values:
+            if '@id' not in value:
+                output.setdefault(prop, []).append(value)
+            elif frame_matches(state['nodes'][value['@id']], subframe):
+                output.setdefault(prop, []).append(frame_node(state, value['@id'], subframe, True))
+
+    # properties of the frame that the node does not have default to null
+    for prop in sorted(frame['properties']):
+        output.setdefault(prop, None)
+
+    state['stack'].pop()
+    return output
+
+def compact_iri(iri, vocab, value_is_null=False):
+    """Compact an IRI with the frame's context, using @vocab for properties and types"""
+    if vocab and iri.startswith(QL) and iri != QL and iri[len(QL):] not in TERM_NAMES:
+        return iri[len(QL):]
+    candidate = None
+    for prefix, namespace in PREFIXES.items():
+        if iri.startswith(namespace) and iri != namespace:
+            curie = f'{prefix}:{iri[len(namespace):]}'
+            if curie not in TERM_NAMES or (value_is_null and TERMS.get(iri, (None,))[0] == curie):
+                if candidate is None or (len(curie), curie) < (len(candidate), candidate):
+                    candidate = curie
+    return candidate or iri
+
+def select_term(prop, value):
+    """The context term to use for the value of a property, if any"""
+    if prop not in TERMS:
+        return None
+    term, coercion, coerced = TERMS[prop]
+    if coercion is None or coercion == '@container':
+        return term
+    if value is None or '@id' in value:
+        return term if coerced == '@id' else None
+    if coercion == '@language':
+        return term if value.get('@language') == coerced else None
+    return term if value.get('@type') == coerced else None
+
+def pruned(state, node_id):
+    """Blank node identifiers are only kept where the node occurs more than once"""
+    return node_id.startswith('_:') and state['bnodes'][node_id] == 1
+
+def compact_value(state, prop, term, value):
+    """Compact an expanded value for the key it ends up under"""
+    coercion, coerced = TERMS[prop][1:] if term else (None, None)
+    if '@value' in value:
+        if coercion == '@language' and value.get('@language') == coerced \
+                or coercion == '@type' and value.get('@type') == coerced \
+                or len(value) == 1:
+            return value['@value']
+        if '@type' in value:
+            return {'type': compact_iri(value['@type'], True, True), '@value': value['@value']}
+        return {'@language': value['@language'], '@value': value['@value']}
+    if len(value) == 1 and '@id' in value and not pruned(state, value['@id']) and coerced == '@id':
+        return compact_iri(value['@id'], False, True)
+    return compact_node(state, value)
+
+def compact_node(state, node):
+    """Compact a framed node with the frame's context"""
+    compacted = {}
+    for prop, values in node.items():
+        if prop == '@id':
+            if not pruned(state, values):
+                compacted['id'] = compact_iri(values, False, True)
+        elif prop == '@type':
+            types = [compact_iri(value, True, True) for value in values]
+            compacted['type'] = types[0] if len(types) == 1 else types
+        elif values is None:
+            term = select_term(prop, None)
+            compacted[term or compact_iri(prop, True)] = None
+        else:
+            for value in values:
+                term = select_term(prop, value)
+                compacted.setdefault(term or compact_iri(prop, True), []).append(compact_value(state, prop, term, value))
+    for key, values in compacted.items():
+        if isinstance(values, list) and len(values) == 1 and key != 'adms:identifier' and key != 'type':
+            compacted[key] = values[0]
+    return compacted
+
+def project_lo(triples):
+    """Project the graph of a single Learning Opportunity as if framed with pipeline/frame.json"""
+    state = {'nodes': node_map(triples), 'bnodes': {}, 'stack': []}
+    framed = []
+    for node_id in sorted(state['nodes']):
+        if LO_TYPES.intersection(state['nodes'][node_id].get('@type', ())):
+            # each top-level match is embedded independently of the others
+            state['embeds'] = set()
+            framed.append(frame_node(state, node_id, LO_FRAME, False))
+    framed = [compact_node(state, node) for node in framed]
+    if not framed:
+        return {} # like jsonld.frame when nothing matches
+    return framed[0] if len(framed) == 1 else {'@graph': framed}
+
+def init_frame_worker(frame, dump):
+    """Set up a framing worker process with the frame and options of the main process"""
+    global lo_frame, dump_graphs
+    lo_frame, dump_graphs = frame, dump
+
+def frame_lo(lo_uri, lo_dataset):
+    """Frame the graph of a single Learning Opportunity as a Meilisearch document"""
+    if lo_frame is None:
+        lo_graph = jsonld.from_rdf(lo_dataset, {**jsonld_options, 'useNativeTypes': True}) if dump_graphs else None
+        framed_json = project_lo(lo_dataset['@default'])
+    else:
+        lo_graph = jsonld.from_rdf(lo_dataset, {**jsonld_options, 'useNativeTypes': True})
+
+        # use JSON-LD framing
+        framed_json = jsonld.frame(lo_graph, lo_frame, jsonld_options)
+        if '@context' in framed_json:
+            del framed_json['@context'] # drop context for Meilisearch
+    framed_json['id'] = doc_id(lo_uri) # use UUIDv5, suitable for Meilisearch
+
+    # only send the unframed graph back from the worker if it is going to be dumped
+    return lo_graph if dump_graphs else None, framed_json
+
+def encode_batch(batch):
+    """Encode a batch of documents as compressed NDJSON"""
+    return gzip.compress(b'\n'.join(map(dumps, batch)))
+
+async def upload_batch(client, body):
+    """Upload an encoded batch of documents to Meilisearch, returning the task UID"""
+    upload_response = await client.post(upload_url, headers=upload_headers, content=body)
+    if upload_response.status_code in RETRY_STATUSES:
+        # uploads replace documents by id, so they are safe to repeat
+        upload_response.raise_for_status()
 
     print(f"📋 Upload response: {upload_response.status_code}")
 
     if upload_response.status_code == 202:
-        task_info = upload_response.json()
-        task_uid = task_info['taskUid']
+        task_uid = upload_response.json()['taskUid']
         print(f"✅ Documents uploaded! Task UID: {task_uid}")
+        return task_uid
+    else:
+        print(f"❌ Upload failed: {upload_response.text}")
 
-        # Monitor the indexing task
-        print("⏳ Monitoring indexing progress...")
-        task_url = f"{MEILISEARCH_URL}/tasks/{task_uid}"
+async def fetch_stage(frame_queue):
+    """Fetch the Learning Opportunities and pass them on for framing"""
+    connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+    async with aiohttp.ClientSession(headers=fuseki_headers, connector=connector) as session:
+        fetched = 0
+        try:
+            # each page is complete, so it can be framed while the next one is fetched
+            async for lo_uris, index in iter_los(session):
+                fetched += len(lo_uris)
+                print(f"✅ LOS query: {len(lo_uris)} results, {fetched} so far")
+                await frame_queue.put((lo_uris, index))
+        except Exception as e:
+            print(f"❌ LOS query failed: {e}")
+            raise e
+    await frame_queue.put(None)
+
+async def frame_stage(pool, frame_queue, upload_queue):
+    """Frame the fetched Learning Opportunities in the process pool and pass them on for upload"""
+    loop = asyncio.get_running_loop()
+    framed = 0
+    while (fetched := await frame_queue.get()) is not None:
+        lo_uris, index = fetched
+        # split each LO's own graph off the combined result
+        futures = [loop.run_in_executor(pool, frame_lo, lo_uri, {'@default': lo_triples(index, lo_uri)})
+                   for lo_uri in lo_uris]
+        # a single LO that fails to frame is reported and skipped, instead of aborting the run
+        results = await asyncio.gather(*futures, return_exceptions=True)
+
+        for lo_uri, result in zip(lo_uris, results):
+            if isinstance(result, Exception):
+                print(f"❌ Framing {lo_uri} failed: {result!r}")
+                continue
+            lo_graph, framed_json = result
+            framed += 1
+
+            if args.dump:
+                # one compact document per line, which keeps the dump cheap and easy to filter
+                print(f"###\n### {lo_uri}\n###\n")
+
+                print("RAW\n---")
+                print(dumps(lo_graph).decode())
+
+                print("FRAMED\n------")
+                print(dumps(framed_json).decode())
+
+            if args.commit:
+                await upload_queue.put(framed_json)
+
+    print(f"✅ Framed {framed} Learning Opportunities")
+    await upload_queue.put(None)
+
+async def upload_stage(client, upload_queue):
+    """Upload framed documents in batches, once a batch is full or no document came in for UPLOAD_INTERVAL seconds"""
+    task_uids = []
+    failed_uploads = 0
+    done = False
+    while not done:
+        batch = []
+        while len(batch) < UPLOAD_BATCH_SIZE:
+            try:
+                doc = await asyncio.wait_for(upload_queue.get(), UPLOAD_INTERVAL if batch else None)
+            except asyncio.TimeoutError:
+                break
+            if doc is None:
+                done = True
+                break
+            batch.append(doc)
+
+        if batch:
+            # encoding and compressing is CPU-bound, so keep it out of the event loop
+            body = await asyncio.to_thread(encode_batch, batch)
+            try:
+                task_uid = await with_retry(upload_batch, client, body)
+            except httpx.HTTPError as e:
+                print(f"❌ Upload failed: {e}")
+                task_uid = None
+            if task_uid is not None:
+                task_uids.append(task_uid)
+            else:
+                failed_uploads += 1
+    return task_uids, failed_uploads
+
+async def run_pipeline():
+    """Fetch, frame and upload concurrently, with queues between the stages; returns the upload task UIDs and the number of failed uploads"""
+    frame_queue = asyncio.Queue(maxsize=2)
+    upload_queue = asyncio.Queue(maxsize=UPLOAD_BATCH_SIZE)
+
+    # framing is CPU-bound, so spread it over worker processes, which get the frame and options passed in
+    with concurrent.futures.ProcessPoolExecutor(max_workers=FRAME_WORKERS, initializer=init_frame_worker,
+                                                initargs=(lo_frame, args.dump)) as pool:
+        async with httpx.AsyncClient(http2=HTTP2, limits=MEILISEARCH_LIMITS, timeout=MEILISEARCH_TIMEOUT) as client:
+            _, _, uploads = await asyncio.gather(
+                fetch_stage(frame_queue),
+                frame_stage(pool, frame_queue, upload_queue),
+                upload_stage(client, upload_queue)
+            )
+    return uploads
+
+# upload in large batches, Meilisearch indexes these much faster than single documents
+# send NDJSON, which Meilisearch parses line by line, and compress it
+upload_headers = {
+    **headers,
+    "Content-Type": "application/x-ndjson",
+    "Content-Encoding": "gzip"
+}
 
-        for i in range(15):  # Check up to 15 times
-            response = requests.get(task_url, headers={"Authorization": f"Bearer {MEILISEARCH_API_KEY}"})
+# index settings that make Meilisearch do work per document, disabled during the bulk load;
+# null resets a setting to its default, and embedders default to none
+BULK_SETTINGS = {
+    "embedders": None,
+    "searchableAttributes": ["*"],
+    "filterableAttributes": []
+}
+settings_url = f"{MEILISEARCH_URL}/indexes/{INDEX_NAME}/settings"
 
-            if response.status_code == 200:
-                task_data = response.json()
-                status = task_data['status']
-                print(f"📋 Task status: {status}")
+# =============================================================================
+# SECTION 5: RUN
+# =============================================================================
 
-                if status == 'succeeded':
-                    print("🎉 SUCCESS! Documents indexed successfully!")
-                    break
-                elif status == 'failed':
-                    print("❌ Indexing failed!")
-                    print(f"Error: {task_data.get('error', {})}")
-                    break
+# worker processes import this script too, only the main process runs it
+if __name__ == '__main__':
+    print("✅ Dependencies loaded successfully!")
+
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error('--depth must be at least 1')
+    MAX_DEPTH = args.depth
+
+    print("⚙️ Configuration variables set")
+
+    with httpx.Client(
+        transport=httpx.HTTPTransport(http2=HTTP2, limits=MEILISEARCH_LIMITS, retries=FETCH_TRIES - 1),
+        timeout=MEILISEARCH_TIMEOUT
+    ) as meilisearch_client:
+        # Create the index
+        create_url = f"{MEILISEARCH_URL}/indexes"
+        index_data = {
+            "uid": INDEX_NAME,
+            "primaryKey": "id"
+        }
+
+        print(f"🏗️ Creating index...")
+
+        create_response = meilisearch_client.post(create_url, headers=headers, json=index_data)
+        print(f"📋 Create index response: {create_response.status_code}")
+
+        if create_response.status_code not in [200, 201, 202]:
+            print(f"⚠️  Index might already exist or there was an error: {create_response.text}")
+
+        # Build Learning Opportunity Specification documents  
+        print("📚 Processing Learning Opportunity Specifications...")
+
+        lo_frame = None
+        if args.frame:
+            with open(args.frame) as f:
+                lo_frame =  json.load(f)
+
+        restore_settings = None
+
+        if args.commit:
+            settings_response = meilisearch_client.get(settings_url, headers=headers)
+            if settings_response.status_code == 200:
+                settings = settings_response.json()
+                if any('apiKey' in embedder for embedder in (settings.get('embedders') or {}).values()):
+                    # API keys are redacted when read back, so embedders like these could not be restored
+                    del settings['embedders']
+                # only touch what is actually configured; empty values are restored as null, i.e. the default
+                restore_settings = {key: settings.get(key) or None for key, value in BULK_SETTINGS.items()
+                                    if key in settings and (settings.get(key) or None) != (value or None)}
+            else:
+                print(f"⚠️  Could not read index settings, loading with them as they are: {settings_response.text}")
+
+            if restore_settings:
+                print(f"⏸️ Disabling {', '.join(restore_settings)} for the bulk load...")
+                response = meilisearch_client.patch(settings_url, headers=headers, json={key: BULK_SETTINGS[key] for key in restore_settings})
+                if response.status_code != 202:
+                    print(f"⚠️  Could not disable index settings: {response.text}")
+                    restore_settings = None
+
+        upload_task_uids, failed_uploads = [], 0
+        # kept apart from the upload tasks, which alone tell whether the documents made it in
+        restore_task_uids = []
+        try:
+            upload_task_uids, failed_uploads = asyncio.run(run_pipeline())
+        finally:
+            if restore_settings:
+                # Meilisearch processes the tasks of an index in order, so this runs once all documents are in,
+                # and re-indexes (and embeds) them in one go
+                print(f"▶️ Restoring {', '.join(restore_settings)}...")
+                response = meilisearch_client.patch(settings_url, headers=headers, json=restore_settings)
+                if response.status_code == 202:
+                    restore_task_uids.append(response.json()['taskUid'])
                 else:
+                    print(f"❌ Restoring index settings failed, restore them by hand: {json.dumps(restore_settings)}")
+
+        task_uids = upload_task_uids + restore_task_uids
+        indexed = False
+        failed = []
+        if task_uids:
+            # check all upload tasks with one request per round, instead of one per task
+            print("⏳ Monitoring indexing progress...")
+            tasks_url = f"{MEILISEARCH_URL}/tasks"
+            # Meilisearch returns 20 tasks per page by default
+            tasks_params = {'uids': ','.join(map(str, task_uids)), 'limit': len(task_uids)}
+            # restoring embedders re-embeds the whole index, which can take a long time
+            deadline = time.monotonic() + args.wait
+
+            while True:
+                response = meilisearch_client.get(tasks_url, params=tasks_params, headers={"Authorization": f"Bearer {MEILISEARCH_API_KEY}"})
+
+                if response.status_code == 200:
+                    tasks = response.json()['results']
+                    pending = [task for task in tasks if task['status'] in ('enqueued', 'processing')]
+                    failed = [task for task in tasks if task['status'] == 'failed']
+                    print(f"📋 Tasks pending: {len(pending)}, failed: {len(failed)} of {len(task_uids)}")
+
+                    if not pending:
+                        indexed = not failed
+                        break
+                    if time.monotonic() >= deadline:
+                        print(f"⚠️  Stopped waiting after {args.wait}s, tasks {', '.join(str(task['uid']) for task in pending)} are still running")
+                        break
                     time.sleep(2)  # Wait 2 seconds before checking again
-            else:
-                print(f"❌ Error checking task: {response.status_code}")
-                break
-    else:
-        print(f"❌ Upload failed: {upload_response.text}")
-
+                else:
+                    print(f"⚠️  Error checking tasks: {response.status_code}")
+                    break
 
+            if failed:
+                print("❌ Indexing failed!")
+                for task in failed:
+                    print(f"Error: {task.get('error', {})}")
+
+        if args.commit:
+            if failed or failed_uploads or not upload_task_uids:
+                if failed_uploads:
+                    print(f"❌ {failed_uploads} of {failed_uploads + len(upload_task_uids)} uploads failed!")
+                elif not upload_task_uids:
+                    print("❌ No documents were uploaded!")
+                sys.exit(1)
+            elif indexed:
+                print("🎉 SUCCESS! Documents indexed successfully!")
+            else:
+                print("✅ Documents uploaded, check the tasks above for when indexing has finished")